@@ -27,21 +27,55 @@
 import os
 import sys
 import argparse
+import collections
+import concurrent.futures
+import threading
 import tempfile
 import datetime
+import html
+import hashlib
+import sqlite3
+import zlib
+import array
 import regex as re
 import pprint
 import unicodedata
 import time
 
-theWordlist = set([])  # set of words, contractions from wordlist.txt
+# bump whenever a check is added, removed or changed so that cached
+# reports produced by older rules are not served
+RULES_VERSION = "2021.3"
+
+# characters never reported as unusual. straight or curly quotes are
+# allowed too, whichever the text mostly uses
+COMMON_CHARS = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 .,:;-?—!()_[]"
+)
+
+# a word for the word index: hyphenated words and contractions whole
+WORD_PATTERN = r"(?:(?<!\p{L})’)?\p{L}+(?:[-’']\p{L}+)*"
+
+# kinds of word list, as named in error messages
+LIST_KINDS = {
+    "words": "wordlist",
+    "goodwords": "good-words (-g)",
+    "abbrevs": "abbreviations (--abbrevs)",
+    "names": "proper names (--names)",
+}
+
+theWordlist = frozenset()  # words, contractions from all word lists
+abbreviations = frozenset()  # words allowed before ". " and a lower-case word
+known_names = frozenset()  # dictionary words that are also proper names
 reports = {}  # a map of description to list
 reports3 = []  # top-level sequential reports
-proper_names = []  # list of probable proper names
+proper_names = set()  # probable proper names
 hypwp = {}  # map of hyphenated words/phrases
 nhypwp = {}  # corresponding map of non-hyphenated words/phrases
 quotetype = ""  # straight or curly quote predominance
-allowed_mixed_case = []  # proper names with accepted mixed case
+allowed_mixed_case = set()  # proper names with accepted mixed case
+check_spent = {}  # seconds spent so far in each check
+skipped_checks = []  # checks that ran out of time, in order skipped
+budget_lock = threading.Lock()  # guards check_spent, skipped_checks
 
 
 def fatal(msg):
@@ -50,15 +84,12 @@ def fatal(msg):
     sys.exit(1)
 
 
-def loadWordlist():
+def loadList(fn):
     """
-    wordlist is English words with contractions
-    it must exist in same directory as main program
+    load a word list: one word per line, UTF-8.
+    used for the wordlist and for all user-supplied lists, which the
+    main program has already checked exist
     """
-    loc = os.path.dirname(os.path.realpath(__file__))
-    fn = f"{loc}/wordlist.txt"
-    if not os.path.isfile(fn):
-        fatal(f"wordlist file {fn} not found")
     try:
         wbuf = open(fn, "r", encoding="UTF-8").read()
         t = wbuf.split("\n")
@@ -70,11 +101,37 @@ def loadWordlist():
     # the wordlist has comments starting with "--"
     # and (some) plural forms listed with trailing "%"
     #   absorbencies%, absorbency
+    words = []
     for item in t:
         if item.startswith("--"):
             continue
         item = item.replace("%", " ")
-        theWordlist.add(item)
+        words.append(item)
+    return words
+
+
+def wordlistFiles(langs):
+    """
+    wordlist.txt is English words with contractions, then there is a
+    wordlist-<lang>.txt for each extra language. they must exist in
+    same directory as main program
+    """
+    loc = os.path.dirname(os.path.realpath(__file__))
+    fns = [f"{loc}/wordlist.txt"]
+    for lang in langs:
+        fns.append(f"{loc}/wordlist-{lang}.txt")
+    return fns
+
+
+def loadWordlist(fns, extra):
+    """
+    merge the word lists and any extra words into one lookup set,
+    built once per run
+    """
+    words = set(extra)
+    for fn in fns:
+        words.update(loadList(fn))
+    return frozenset(words)
 
 
 class P:
@@ -164,14 +221,127 @@ class Paragraphs:
         self.parg[m].reports[n][p] = z
 
 
+def fileHash(fn):
+    """SHA-256 hex digest of a file's bytes"""
+    h = hashlib.sha256()
+    try:
+        with open(fn, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+    except Exception as e:
+        fatal(f"file failed to hash. ({e})")
+    return h.hexdigest()
+
+
+def cacheKey(indigest, verbose, listfiles):
+    """
+    cache key for a whole-file report: input contents, verbose flag,
+    word list contents and rules version all have to match.
+    indigest is the SHA-256 of the input as loaded by loadFile.
+    listfiles is a list of [kind, filename] for every word list used
+    """
+    h = hashlib.sha256()
+    h.update(indigest.encode())
+    h.update(b"v" if verbose else b"-")
+    for kind, fn in listfiles:
+        h.update(f"{kind}:{fileHash(fn)}".encode())
+    h.update(RULES_VERSION.encode())
+    return h.hexdigest()
+
+
+def cacheGet(cachedir, key):
+    """return the cached report body for key, or None on a miss"""
+    fn = os.path.join(cachedir, f"{key}.htm")
+    try:
+        with open(fn, "r", encoding="UTF-8") as f:
+            body = f.read()
+    except OSError:
+        return None
+    # mark as recently used for eviction. only the owner may do this,
+    # so a worker running as another user still gets the hit
+    try:
+        os.utime(fn)
+    except OSError:
+        pass
+    return body
+
+
+def cachePut(cachedir, key, body):
+    """
+    store a report body. written to a temporary file in the cache
+    directory and renamed into place, so concurrent workers never see
+    a partial report; the last writer of an identical report wins.
+    mkstemp makes the file private; it is opened up to the usual mode
+    for new files so workers running as other users can read it.
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    try:
+        os.makedirs(cachedir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cachedir, prefix=".tmp-", suffix=".htm")
+        os.fchmod(fd, 0o666 & ~umask)
+        with os.fdopen(fd, "w", encoding="UTF-8") as f:
+            f.write(body)
+        os.replace(tmp, os.path.join(cachedir, f"{key}.htm"))
+    except OSError as e:
+        print(f"warning: report not cached. ({e})")
+
+
+def cacheEvict(cachedir, max_bytes, max_age):
+    """
+    remove cached reports older than max_age seconds, then the least
+    recently used ones until the cache is at most max_bytes.
+    files may vanish underneath us if another worker is evicting too.
+    """
+    now = time.time()
+    entries = []
+    try:
+        names = os.listdir(cachedir)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith(".htm"):
+            continue
+        fn = os.path.join(cachedir, name)
+        try:
+            st = os.stat(fn)
+        except OSError:
+            continue
+        # abandoned temporary files are only removed once stale
+        if name.startswith(".tmp-") and now - st.st_mtime < 3600:
+            continue
+        if now - st.st_mtime > max_age or name.startswith(".tmp-"):
+            try:
+                os.remove(fn)
+            except OSError:
+                pass
+            continue
+        entries.append([st.st_mtime, st.st_size, fn])
+    total = sum(e[1] for e in entries)
+    entries.sort()  # oldest first
+    while total > max_bytes and len(entries) > 0:
+        _, size, fn = entries.pop(0)
+        try:
+            os.remove(fn)
+        except OSError:
+            pass
+        total -= size
+
+
 def loadFile(fn):
     """
     load specified UTF-8 file. strips BOM if present
+    returns the lines and the SHA-256 of the bytes they came from,
+    so the cache key always matches the text that is checked
     """
     if not os.path.isfile(fn):
         fatal("file {} not found".format(fn))
     try:
-        wbuf = open(fn, "r", encoding="UTF-8").read()
+        with open(fn, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        # same newline handling as reading in text mode
+        wbuf = raw.decode("UTF-8").replace("\r\n", "\n").replace("\r", "\n")
         wbs = wbuf.split("\n")
         # remove BOM on first line if present
         t31 = ":".join("{0:x}".format(ord(c)) for c in wbs[0])
@@ -181,7 +351,163 @@ def loadFile(fn):
         fatal(f"file failed to load. ({e})")
     while len(wbs) > 1 and wbs[-1] == "":  # no trailing blank lines
         wbs.pop()
-    return wbs
+    return wbs, digest
+
+
+def buildIndex(wb):
+    """
+    word concordance for the text: every word with the lines (0-based)
+    it occurs on, once per occurrence. columns are not kept; a lookup
+    finds the word again in the line.
+    hyphenated words and contractions are kept whole: "to-day",
+    "don’t", "o’clock". a curly apostrophe may also start a word
+    ("’tis"); a straight one there cannot be told from a quote mark.
+    """
+    words = {}
+    for i, aline in enumerate(wb):
+        for item in re.finditer(WORD_PATTERN, aline):
+            theword = item.group(0)
+            if theword not in words:
+                words[theword] = []
+            words[theword].append(i)
+    return words
+
+
+def foldWord(w):
+    """
+    index key: case-folded, hyphens removed. 'To-day' -> 'today'.
+    apostrophes are kept, as "it’s" is not "its", but straight ones
+    are made curly so "don't" finds "don’t"
+    """
+    return w.casefold().replace("-", "").replace("'", "’")
+
+
+def writeIndex(fn, infile, wb, indigest):
+    """
+    save the concordance next to the report, as an SQLite file so a
+    lookup reads only the rows it needs. the text itself is not saved;
+    the byte offset of every line is, and a lookup seeks to the lines
+    it shows in the source file. line numbers are stored as
+    differences from the previous one, which are mostly small.
+    """
+    try:
+        with open(infile, "rb") as f:
+            raw = f.read()
+        st = os.stat(infile)
+    except Exception as e:
+        fatal(f"file failed to load. ({e})")
+    if hashlib.sha256(raw).hexdigest() != indigest:
+        fatal(f"file {infile} changed while it was being checked")
+    # same line breaks as loadFile
+    starts = array.array("I", [0])
+    for item in re.finditer(rb"\r\n|\r|\n", raw):
+        starts.append(item.end())
+    rows = []
+    for theword, lines in buildIndex(wb).items():
+        deltas = [lines[0]] + [b - a for a, b in zip(lines, lines[1:])]
+        rows.append((theword, foldWord(theword), ",".join(map(str, deltas))))
+    try:
+        if os.path.exists(fn):
+            os.remove(fn)
+        conn = sqlite3.connect(fn)
+        with conn:
+            conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value)")
+            conn.execute("CREATE TABLE words (word TEXT, key TEXT, lines TEXT)")
+            conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    ("source", os.path.realpath(infile)),
+                    ("size", st.st_size),
+                    ("mtime", st.st_mtime_ns),
+                    ("starts", zlib.compress(starts.tobytes())),
+                ],
+            )
+            conn.executemany("INSERT INTO words VALUES (?, ?, ?)", rows)
+            conn.execute("CREATE INDEX words_key ON words (key)")
+        conn.close()
+    except Exception as e:
+        fatal(f"index failed to save. ({e})")
+
+
+def readLine(f, starts, n):
+    """line n of an open source file, as loadFile would give it"""
+    f.seek(starts[n])
+    if n + 1 < len(starts):
+        b = f.read(starts[n + 1] - starts[n])
+    else:
+        b = f.read()
+    aline = b.decode("UTF-8").rstrip("\r\n")
+    if n == 0 and aline.startswith("\ufeff"):
+        aline = aline[1:]
+    return aline
+
+
+def queryIndex(fn, lookfor, limit):
+    """
+    keyword-in-context lookup. all spellings of the word that differ
+    only in case or hyphenation are shown with their counts.
+    """
+    if not os.path.isfile(fn):
+        fatal(f"index file {fn} not found")
+    try:
+        conn = sqlite3.connect(f"file:{fn}?mode=ro", uri=True)
+        meta = dict(conn.execute("SELECT name, value FROM meta"))
+        rows = conn.execute(
+            "SELECT word, lines FROM words WHERE key = ? ORDER BY word",
+            (foldWord(lookfor),),
+        ).fetchall()
+        conn.close()
+    except Exception as e:
+        fatal(f"index failed to load. ({e})")
+    source = meta["source"]
+    name = os.path.basename(source)
+    if len(rows) == 0:
+        print(f'"{lookfor}" not found in {name}')
+        return
+    variants = []
+    for v, deltas in rows:
+        lines = []
+        line = 0
+        for d in deltas.split(","):
+            line += int(d)
+            lines.append(line)
+        variants.append([v, lines])
+    print(", ".join(f'"{v}" ({len(lines)})' for v, lines in variants) + f" in {name}")
+    try:
+        st = os.stat(source)
+    except OSError:
+        fatal(f"source file {source} not found")
+    if st.st_size != meta["size"] or st.st_mtime_ns != meta["mtime"]:
+        fatal(f"source file {source} has changed since the index was saved")
+    starts = array.array("I")
+    starts.frombytes(zlib.decompress(meta["starts"]))
+    width = 30  # characters of context each side
+    with open(source, "rb") as f:
+        for v, lines in variants:
+            print(f'\n"{v}"')
+            count = 0
+            prev = -1
+            for line in lines:
+                if count == limit:
+                    print(f"   ... {len(lines) - limit} more")
+                    break
+                # the nth time a line is listed is the nth match on it
+                if line == prev:
+                    nth += 1
+                else:
+                    nth = 0
+                prev = line
+                aline = readLine(f, starts, line)
+                cols = [
+                    item.start()
+                    for item in re.finditer(WORD_PATTERN, aline)
+                    if item.group(0) == v
+                ]
+                col = cols[min(nth, len(cols) - 1)]
+                left = aline[max(0, col - width) : col]
+                right = aline[col + len(v) : col + len(v) + width]
+                print(f"  {line+1:5}: {left:>{width}}[{v}]{right}")
+                count += 1
 
 
 """
@@ -189,23 +515,193 @@ main program
 """
 
 parser = argparse.ArgumentParser()
-parser.add_argument("-i", "--infile", help="input file", required=True)
+parser.add_argument("-i", "--infile", help="input file", required=False)
 parser.add_argument(
     "-o", "--outfile", help="output file", default="report.txt", required=False
 )
 parser.add_argument("-v", "--verbose", help="show all reports", action="store_true")
+parser.add_argument(
+    "-c",
+    "--cachedir",
+    help="directory for cached reports",
+    default=None,
+    required=False,
+)
+parser.add_argument(
+    "--cache-max-mb",
+    help="maximum size of report cache in MB",
+    type=int,
+    default=100,
+    required=False,
+)
+parser.add_argument(
+    "--cache-max-days",
+    help="maximum age of a cached report in days",
+    type=int,
+    default=30,
+    required=False,
+)
+parser.add_argument(
+    "--check-timeout",
+    help="seconds any one check may run before it is skipped",
+    type=float,
+    default=20.0,
+    required=False,
+)
+parser.add_argument(
+    "--run-timeout",
+    help="seconds all checks together may run before the rest are skipped",
+    type=float,
+    default=300.0,
+    required=False,
+)
+parser.add_argument(
+    "-l",
+    "--lang",
+    help="also use wordlist-LANG.txt (may be repeated)",
+    action="append",
+    default=[],
+)
+parser.add_argument(
+    "-g",
+    "--goodwords",
+    help="per-project good words file (may be repeated)",
+    action="append",
+    default=[],
+)
+parser.add_argument(
+    "--abbrevs", help="file of abbreviations that take a period", default=None
+)
+parser.add_argument("--names", help="file of known proper names", default=None)
+parser.add_argument(
+    "-j",
+    "--threads",
+    help="check paragraphs on this many threads",
+    type=int,
+    default=1,
+)
+parser.add_argument(
+    "-x", "--index", help="word index file to save or query", default=None
+)
+parser.add_argument(
+    "-q", "--query", help="look up a word in the index and exit", default=None
+)
 args = vars(parser.parse_args())
+run_started = time.monotonic()
+
+# a lookup only needs the saved index, not the source text
+if args["query"] is not None:
+    if args["index"] is None:
+        fatal("a query needs an index file (-x)")
+    queryIndex(args["index"], args["query"], 100 if args["verbose"] else 10)
+    sys.exit(0)
+if args["infile"] is None:
+    fatal("an input file (-i) is required")
+
+# every word list used by this run
+listfiles = [["words", fn] for fn in wordlistFiles(args["lang"])]
+for fn in args["goodwords"]:
+    listfiles.append(["goodwords", fn])
+if args["abbrevs"] is not None:
+    listfiles.append(["abbrevs", args["abbrevs"]])
+if args["names"] is not None:
+    listfiles.append(["names", args["names"]])
+for kind, fn in listfiles:
+    if not os.path.isfile(fn):
+        fatal(f"{LIST_KINDS[kind]} file {fn} not found")
+
+
+def writeReport(body):
+    """write the report header and the (possibly cached) body"""
+    with open(args["outfile"], "w") as f:
+        f.write("<pre>")
+        f.write("pgtext run report\n")
+        f.write(f"run started: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write("source file: {}\n".format(os.path.basename(args["infile"])))
+        f.write(
+            f"<span style='color:silver'>close this window to return to the UWB.</span>\n"
+        )
+        f.write("\n")
+        f.write(body)
+        f.write("</pre>")
+
+
+# a byte-identical input with the same options, wordlist and rules
+# produces the same report, so serve it from the cache if we can
+# the input is read once; the cache key is the hash of those bytes
+wb, indigest = loadFile(args["infile"])
+
+cachekey = None
+if args["cachedir"] is not None:
+    cachekey = cacheKey(indigest, args["verbose"], listfiles)
+    cached = cacheGet(args["cachedir"], cachekey)
+    if cached is not None:
+        writeReport(cached)
+        if args["index"] is not None:
+            writeIndex(args["index"], args["infile"], wb, indigest)
+        sys.exit(0)
 
 pp = pprint.PrettyPrinter(indent=4)
 
-# load word list, including common English contractions
-loadWordlist()
+# dictionary words that are common names
+special_prop = [
+    "Bud",
+    "Will",
+    "Jack",
+    "Jimmy",
+    "Carol",
+    "Amber",
+    "Mark",
+    "Scott",
+    "Frank",
+]
+
+# common abbreviations that appear with a period mid-sentence,
+# such as "50 per cent. per annum"
+special_abbrevs = [
+    "cent",
+    "cents",
+    "viz",
+    "vol",
+    "vols",
+    "vid",
+    "ed",
+    "al",
+    "etc",
+    "op",
+    "cit",
+    "deg",
+    "min",
+    "chap",
+    "oz",
+    "mme",
+    "mlle",
+    "mssrs",
+    "gym",
+]
+
+# load word lists, including common English contractions, and merge
+# each kind with the user's lists once for the whole run
+project_words = []
+for fn in args["goodwords"]:
+    project_words.extend(loadList(fn))
+theWordlist = loadWordlist(wordlistFiles(args["lang"]), project_words)
+user_abbrevs = []
+if args["abbrevs"] is not None:
+    user_abbrevs = loadList(args["abbrevs"])
+abbreviations = frozenset(special_abbrevs + user_abbrevs)
+user_names = []
+if args["names"] is not None:
+    user_names = loadList(args["names"])
+known_names = frozenset(special_prop + user_names)
 
 paras = Paragraphs()  # new, empty Paragraph class
 
-wb = loadFile(args["infile"])
 paras.populatePara(wb)
 
+if args["index"] is not None:
+    writeIndex(args["index"], args["infile"], wb, indigest)
+
 
 def report(pn, item, alt="^", offset=0):
     """the 'alt' argument, if present, replaces the default '^'"""
@@ -215,17 +711,67 @@ def report(pn, item, alt="^", offset=0):
 
 def report2(pn, item, desc):
     """paragraph number, where it is (linearly), description"""
+    reportAt(pn, item.start(), desc)
+
 
-    # if description already in map, append to reports for that error
+def reportAt(pn, posn, desc):
+    """paragraph number, linear position, description"""
+    line, _ = paras.trlate(pn, posn)
+    reportLine(paras.startline(pn) + line, desc)
+
+
+def reportLine(theline, desc):
+    """line number in wb, description"""
     if desc not in reports:
         reports[desc] = []
-    line, _ = paras.trlate(pn, item.start())
-    theline = paras.startline(pn) + line
     # append only new reports
     if f"{theline} {wb[theline]}" not in reports[desc]:
         reports[desc].append(f"{theline} {wb[theline]}")
 
 
+def scan(check, pattern, s, flags=0):
+    """
+    re.finditer for a named check, with time budgets.
+    each check has its own budget for the whole run and all checks share
+    the run budget. a check that runs out is skipped from then on and
+    listed in the report; the matches are returned as a list.
+    with threads, matching releases the GIL (concurrent=True); this is
+    safe because s is an immutable str.
+    budgets are elapsed time, the clock regex enforces its timeout with;
+    a check is charged the elapsed time of its own matching only.
+    """
+    with budget_lock:
+        if check in skipped_checks:
+            return []
+        remaining = min(
+            args["check_timeout"] - check_spent.get(check, 0.0),
+            args["run_timeout"] - (time.monotonic() - run_started),
+        )
+    started = time.monotonic()
+    try:
+        if remaining <= 0:
+            raise TimeoutError
+        m = list(
+            re.finditer(
+                pattern,
+                s,
+                flags,
+                timeout=remaining,
+                concurrent=args["threads"] > 1,
+            )
+        )
+    except TimeoutError:
+        m = None
+    taken = time.monotonic() - started
+    with budget_lock:
+        if m is None:
+            m = []
+            if check not in skipped_checks:
+                skipped_checks.append(check)
+        check_spent[check] = check_spent.get(check, 0.0) + taken
+    return m
+
+
 def report3(s, highlight=False, lineabove=False):
     """top level reports, not associated with a line number"""
     if highlight:
@@ -239,16 +785,21 @@ def report3(s, highlight=False, lineabove=False):
 # determine if the text uses straight or curly quotes. use that to
 # flag those that are inconsistent later if curly quotes are used.
 
-count_straight = 0
-count_curly = 0
-for pn, ap in enumerate(paras.parg):
-    s = ap.ptext  # get the paragraph
-    count_straight += s.count('"')
-    count_straight += s.count("'")
-    count_curly += s.count("”")
-    count_curly += s.count("“")
-    count_curly += s.count("’")
-    count_curly += s.count("‘")
+# character inventory: every character in the text is counted in one
+# pass. the lines are kept only for characters outside COMMON_CHARS,
+# as only those may be reported as unusual characters.
+
+charcount = collections.Counter()  # character -> count
+charlines = {}  # uncommon character -> lines (0-based) it is on
+for i, aline in enumerate(wb):
+    charcount.update(aline)
+    for c in set(aline).difference(COMMON_CHARS):
+        if c not in charlines:
+            charlines[c] = []
+        charlines[c].append(i)
+
+count_straight = charcount['"'] + charcount["'"]
+count_curly = charcount["”"] + charcount["“"] + charcount["’"] + charcount["‘"]
 if count_curly > count_straight:
     quotetype = "curly"
 else:
@@ -268,31 +819,19 @@ for pn, ap in enumerate(paras.parg):
         else:
             prop[theword] = 1
 
-# dictionary words that are common names
-special_prop = [
-    "Bud",
-    "Will",
-    "Jack",
-    "Jimmy",
-    "Carol",
-    "Amber",
-    "Mark",
-    "Scott",
-    "Frank",
-]
-
 # any capitalized word that is not in the wordlist as lower-case
 # and that occurs at least twice is perhaps a proper name
 for item in prop:
-    if item in special_prop:
-        proper_names.append(item)
+    if item in known_names:
+        proper_names.add(item)
     if not item.lower() in theWordlist and prop[item] >= 2:
-        proper_names.append(item)
+        proper_names.add(item)
 
-# save proper names with mixed capitalization
-for item in proper_names:
+# save proper names with mixed capitalization. mixed-case words in the
+# user's own lists (good words, names) are accepted too
+for item in proper_names.union(known_names, project_words):
     if re.search(r".\p{Ll}\p{Lu}|.\p{Lu}\p{Ll}", item):
-        allowed_mixed_case.append(item)
+        allowed_mixed_case.add(item)
 
 # identify hyphenated words/phrases with counts
 # 'desk-sergeant': 1, 'made-by-the-million': 1, etc.
@@ -352,35 +891,47 @@ for item in hypwp:
 #                    count_hthephrase += 1
 
 # run tests, paragraph at-a-time
-for pn, ap in enumerate(paras.parg):
+# checkPara only reads shared state; what it finds is returned and
+# recorded in paragraph order afterwards, so paragraphs may be checked
+# on a thread pool and the report is the same as a sequential run.
+
+
+def checkPara(ap):
+    """
+    run the paragraph checks on one paragraph.
+    returns a list of (linear position, description), in check order
+    """
+    hits = []
     s = ap.ptext  # get a paragraph as one string
 
     # allow Illustration, Greek, Music, "Transcriber" or number after '['
-    m = re.finditer(r"\[[^IGMT\d]", s)
+    m = scan("unexpected character after '['", r"\[[^IGMT\d]", s)
     for item in m:
-        report2(pn, item, "unexpected character after '['")
+        hits.append((item.start(), "unexpected character after '['"))
 
     # punctuation checks
 
     # punctuation after "the"
-    m = re.finditer(r"(^|[\p{Z}\p{P}])the\p{P}", s)
+    m = scan("punctuation after 'the'", r"(^|[\p{Z}\p{P}])the\p{P}", s)
     for item in m:
-        report2(pn, item, "punctuation after 'the'")
+        hits.append((item.start(), "punctuation after 'the'"))
     # date format October 8,1948
-    m = re.finditer(r",1\p{N}\p{N}\p{N}", s)
+    m = scan("suspect date punctuation", r",1\p{N}\p{N}\p{N}", s)
     for item in m:
-        report2(pn, item, "suspect date punctuation")
+        hits.append((item.start(), "suspect date punctuation"))
     # special cases of contiguous punctuation
     s2 = s.replace("etc.,", "")  # allow "etc.,"
-    m = re.finditer(r"(,\.)|(\.,)|(,,)|([^\.]\.\.([^\.]|$))", s2)
+    m = scan(
+        "suspect contiguous punctuation", r"(,\.)|(\.,)|(,,)|([^\.]\.\.([^\.]|$))", s2
+    )
     for item in m:
-        report2(pn, item, "suspect contiguous punctuation")
+        hits.append((item.start(), "suspect contiguous punctuation"))
     # collapsed punctuation
     # m = re.finditer(r"[\p{L}|\p{N}]\p{Z}?[\.:;,][\p{L}|\p{N}]", s)
-    m = re.finditer(r"(\p{L})[\.:;,](\p{L})", s)
+    m = scan("incorrectly spaced punctuation", r"(\p{L})[\.:;,](\p{L})", s)
     for item in m:
         if not (item.group(1).isnumeric() and item.group(2).isnumeric()):
-            report2(pn, item, "incorrectly spaced punctuation")
+            hits.append((item.start(), "incorrectly spaced punctuation"))
 
     # -------------------------------------------------------------------------
     # mixed case in word (3 checks)
@@ -391,180 +942,175 @@ for pn, ap in enumerate(paras.parg):
     # a lower case letter before the word ends
     # m = re.finditer(r'(^|[\p{Z}\p{P}])\p{Lu}\p{Lu}\p{L}?\p{Ll}', s)
     # for item in m:
-    #    report2(pn, item, "mixed case in word")
+    #    hits.append((item.start(), "mixed case in word"))
     # first upper followed by lower then upper somewhere in word
     # m = re.finditer(r'(^|[\p{Z}\p{P}])\p{Lu}[^\p{Z}\p{P}]*?\p{Ll}\p{Lu}', s)
     # for item in m:
-    #    report2(pn, item, "mixed case in word")
+    #    hits.append((item.start(), "mixed case in word"))
     # first lower followed by upper anywhere in word
     # m = re.finditer(r'(^|[\p{Z}\p{P}])\p{Ll}[^\p{Z}\p{P}]*?\p{Lu}', s)
     # for item in m:
-    #    report2(pn, item, "mixed case in word")
+    #    hits.append((item.start(), "mixed case in word"))
+
+    # the lookahead finds the case change, then the possessive \p{L}*+
+    # takes the rest of the word without backtracking. written as
+    # \p{L}*\p{Lu}\p{L}* these were quadratic on long runs of letters.
 
     # two upper followed by lower somewhere in word (HAPpY)
-    m = re.finditer(
-        r"(^|[\p{Z}\p{P}])(\p{Lu}\p{Lu}\p{L}*\p{Ll}\p{L}*)([\p{Z}\p{P}]|$)", s
+    m = scan(
+        "mixed case in word (HAPpY)",
+        r"(^|[\p{Z}\p{P}])(\p{Lu}\p{Lu}(?=\p{L}*\p{Ll})\p{L}*+)([\p{Z}\p{P}]|$)",
+        s,
     )
     for item in m:
         if not item.group(2) in allowed_mixed_case:
-            report2(pn, item, "mixed case in word")
+            hits.append((item.start(), "mixed case in word"))
 
     # first upper followed by lower then upper somewhere in word (HapPy)
-    m = re.finditer(
-        r"(^|[\p{Z}\p{P}])(\p{Lu}\p{Ll}\p{L}*\p{Lu}\p{L}*)([\p{Z}\p{P}]|$)", s
+    m = scan(
+        "mixed case in word (HapPy)",
+        r"(^|[\p{Z}\p{P}])(\p{Lu}\p{Ll}(?=\p{L}*\p{Lu})\p{L}*+)([\p{Z}\p{P}]|$)",
+        s,
     )
     for item in m:
         if not item.group(2) in allowed_mixed_case:
-            report2(pn, item, "mixed case in word")
+            hits.append((item.start(), "mixed case in word"))
 
     # first lower followed by upper anywhere in word
-    m = re.finditer(r"(^|[\p{Z}\p{P}])(\p{Ll}\p{L}*\p{Lu}\p{L}*)([\p{Z}\p{P}]|$)", s)
+    m = scan(
+        "mixed case in word (hapPy)",
+        r"(^|[\p{Z}\p{P}])(\p{Ll}(?=\p{L}*\p{Lu})\p{L}*+)([\p{Z}\p{P}]|$)",
+        s,
+    )
     for item in m:
         if not item.group(2) in allowed_mixed_case:
-            report2(pn, item, "mixed case in word")
+            hits.append((item.start(), "mixed case in word"))
 
     # -------------------------------------------------------------------------
     # rare to end word
-    m = re.finditer(
-        r"(cb|gb|pb|sb|tb|wh|fr|br|qu|tw|gl|fl|sw|gr|sl|cl|iy)($|[\p{Z}\p{P}])", s
+    m = scan(
+        "unusual characters ending word",
+        r"(cb|gb|pb|sb|tb|wh|fr|br|qu|tw|gl|fl|sw|gr|sl|cl|iy)($|[\p{Z}\p{P}])",
+        s,
     )
     for item in m:
-        report2(pn, item, "unusual characters ending word")
+        hits.append((item.start(), "unusual characters ending word"))
 
     # rare to start word
-    m = re.finditer(r"(^|[\p{Z}\p{P}])(hr|hl|cb|sb|tb|wb|tl|tn|rn|lt|tj)", s)
+    m = scan(
+        "unusual characters starting word",
+        r"(^|[\p{Z}\p{P}])(hr|hl|cb|sb|tb|wb|tl|tn|rn|lt|tj)",
+        s,
+    )
     for item in m:
-        report2(pn, item, "unusual characters starting word")
+        hits.append((item.start(), "unusual characters starting word"))
 
     # single character paragraph
-    m = re.finditer(r"^.$", s)
+    m = scan("single character paragraph", r"^.$", s)
     for item in m:
-        report2(pn, item, "single character paragraph")
+        hits.append((item.start(), "single character paragraph"))
 
     # hyphenation adjacent to space
-    m = re.finditer(r"\p{L}(-\s+|\s+-)\p{L}", s)
+    m = scan("hyphenation adjacent to space", r"\p{L}(-\s+|\s+-)\p{L}", s)
     for item in m:
-        report2(pn, item, "hyphenation adjacent to space")
+        hits.append((item.start(), "hyphenation adjacent to space"))
 
     # exclamation point suspect: “You should runI”
-    m = re.finditer(r"I”", s)
+    m = scan("exclamation point suspect", r"I”", s)
     for item in m:
-        report2(pn, item, "exclamation point suspect")
+        hits.append((item.start(), "exclamation point suspect"))
 
     # unexpected period: "this is. not a easy task"
-    # do not report common abbreviations that appear with a period,
-    # such as "50 per cent. per annum"
-    m = re.finditer(r"(\p{L}+)\.\p{Z}\p{Ll}", s)
-    for item in m:
-        if not item.group(1) in [
-            "cent",
-            "cents",
-            "viz",
-            "vol",
-            "vols",
-            "vid",
-            "ed",
-            "al",
-            "etc",
-            "op",
-            "cit",
-            "deg",
-            "min",
-            "chap",
-            "oz",
-            "mme",
-            "mlle",
-            "mssrs",
-            "gym",
-        ]:
-            report2(pn, item, "unexpected period")
+    # do not report abbreviations that appear with a period
+    m = scan("unexpected period", r"(\p{L}+)\.\p{Z}\p{Ll}", s)
+    for item in m:
+        if not item.group(1) in abbreviations:
+            hits.append((item.start(), "unexpected period"))
 
     # disjointed contraction
-    m = re.finditer(r"\p{Z}’(m|ve|ll|t)($|[\p{Z}\p{P}])", s)
+    m = scan("disjointed contraction", r"\p{Z}’(m|ve|ll|t)($|[\p{Z}\p{P}])", s)
     for item in m:
-        report2(pn, item, "disjointed contraction")
+        hits.append((item.start(), "disjointed contraction"))
 
     # suspected HTML tag
-    m = re.finditer(r"<[^>]+>", s)
+    m = scan("suspected HTML tag", r"<[^>]+>", s)
     for item in m:
-        report2(pn, item, "suspected HTML tag")
+        hits.append((item.start(), "suspected HTML tag"))
 
     # quote direction (by context)
-    m = re.finditer(
-        r"([\.,;!?’‘]+[‘“])|([A-Za-z]+[“])|([A-LN-Za-z]+[‘])|(“ )|( ”)|(‘s\s)", s
+    # the lookbehinds only try a run of letters from its first letter,
+    # otherwise a long run with no quote after it is quadratic
+    m = scan(
+        "quote direction (by context)",
+        r"([\.,;!?’‘]+[‘“])|((?<![A-Za-z])[A-Za-z]+[“])|((?<![A-LN-Za-z])[A-LN-Za-z]+[‘])|(“ )|( ”)|(‘s\s)",
+        s,
     )
     for item in m:
-        report2(pn, item, "quote direction (by context)")
+        hits.append((item.start(), "quote direction (by context)"))
 
     # standalone 0 or 1
-    m = re.finditer(r"(^|[\p{Z}\p{P}])([01])($|[\p{Z}\p{P}])", s)
+    m = scan("standalone 0 or 1", r"(^|[\p{Z}\p{P}])([01])($|[\p{Z}\p{P}])", s)
     for item in m:
         if not (
             item.group(2) == "1" and item.group(3) == ","
         ):  # allow 1,000 or Oct. 1,
-            report2(pn, item, "standalone 0 or 1")
+            hits.append((item.start(), "standalone 0 or 1"))
 
     # mixed numbers/letters in word
-    m = re.finditer(
+    m = scan(
+        "mixed numbers/letters in word",
         r"(^|[\p{Z}\p{P}])([^\p{Z}\p{P}]*(\p{L}\p{N}|\p{N}\p{L})[^\p{Z}\p{P}]*)($|[\p{Z}\p{P}])",
         s,
     )
     for item in m:
         theword = item.group(2)
+        if theword in theWordlist:  # such as a project's good word "H2O"
+            continue
         if not re.match(r"\d+(st|nd|rd|th)", theword):
-            report2(pn, item, f"mixed numbers/letters in word {item.group(2)}")
+            hits.append(
+                (item.start(), f"mixed numbers/letters in word {item.group(2)}")
+            )
 
     # period/comma suspect
     # period, space, lower-case letter
     # meant to catch "You never know. inevitably, where you will find her."
-    m = re.finditer(r"\. \p{Ll}", s)
+    m = scan("period/comma suspect", r"\. \p{Ll}", s)
     for item in m:
-        report2(pn, item, f"period/comma suspect")
+        hits.append((item.start(), f"period/comma suspect"))
     # comma, space, capitalized word that's also in wordlist in lower-case
     # meant to catch "He went to the farm, Then he saw her."
-    m = re.finditer(r"\, (\p{Lu}\p{L}+)", s)
+    m = scan("period/comma suspect", r"\, (\p{Lu}\p{L}+)", s)
     for item in m:
         # allow "If you say so, Morgan." using proper names list
         theword = item.group(1).lower()
         if not item.group(1) in proper_names and theword in theWordlist:
-            report2(pn, item, f"period/comma suspect")
+            hits.append((item.start(), f"period/comma suspect"))
 
     # Blank Page placeholder
-    m = re.finditer(r"blank page", s, re.IGNORECASE)
+    m = scan("Blank Page placeholder", r"blank page", s, re.IGNORECASE)
     for item in m:
-        report2(pn, item, "Blank Page placeholder")
+        hits.append((item.start(), "Blank Page placeholder"))
 
     # hyphenation and dashes
 
     # mixed hyphen-dash
     # note, will catch the common construction: space+en-dash+space
-    m = re.finditer(r"(\p{Pd})(\p{Pd})", s, re.IGNORECASE)
+    m = scan("mixed hyphen-dash", r"(\p{Pd})(\p{Pd})", s, re.IGNORECASE)
     for item in m:
         if item.group(1) != item.group(2):
-            report2(pn, item, "mixed hyphen-dash")
+            hits.append((item.start(), "mixed hyphen-dash"))
     # mixed hyphen-dash
-    m = re.finditer(r"(\p{Pd})", s, re.IGNORECASE)
+    m = scan("potentially unsafe ePub dash", r"(\p{Pd})", s, re.IGNORECASE)
     for item in m:
         if item.group(1) not in "—-–":  # em-, hyphen, en-dash
-            report2(pn, item, "potentially unsafe ePub dash")
+            hits.append((item.start(), "potentially unsafe ePub dash"))
     # spaced dash
-    m = re.finditer(r"\p{Z}\p{Pd}", s, re.IGNORECASE)
+    m = scan("spaced dash", r"\p{Z}\p{Pd}", s, re.IGNORECASE)
     for item in m:
-        report2(pn, item, "spaced dash")
-    m = re.finditer(r"\p{Pd}\p{Z}", s, re.IGNORECASE)
+        hits.append((item.start(), "spaced dash"))
+    m = scan("spaced dash", r"\p{Pd}\p{Z}", s, re.IGNORECASE)
     for item in m:
-        report2(pn, item, "spaced dash")
-
-    # unusual characters
-    # allow special pattern for DP-style thought break
-    if quotetype == "straight":
-        m = re.finditer(r'[^A-Za-z0-9 \.,:;"\'\-\?—!\(\)_\[\]]', s)
-    else:
-        m = re.finditer(r"[^A-Za-z0-9 \.,:;“”‘’\-\?—!\(\)_\[\]]", s)
-    for item in m:
-        if re.match("^\s+\*\s+\*\s+\*\s+\*\s+\*", s):  # allow DP thought break
-            continue
-        report2(pn, item, f"unusual character {unicodedata.name(item.group(0))}")
+        hits.append((item.start(), "spaced dash"))
 
     NOCOMMAPATTERN = "(^|[\p{Z}\p{P}])(the,|it’s,|their,|an,|mrs,|a,|our,\
     |that’s,|its,|whose,|every,|i’ll,|your,|my,|mr,|mrs,|mss,|mssrs,|ft,|\
@@ -572,9 +1118,9 @@ for pn, ap in enumerate(paras.parg):
     toward,|among,)"
 
     # commas not expected after certain words
-    m = re.finditer(NOCOMMAPATTERN, s)
+    m = scan("unexpected comma after word", NOCOMMAPATTERN, s)
     for item in m:
-        report2(pn, item, "unexpected comma after word")
+        hits.append((item.start(), "unexpected comma after word"))
 
     NOPERIODPATTERN = "(^|[\p{Z}\p{P}])(every\.|i’m\.|during\.|that’s\.\
     |their\.|your\.|our\.|my\.|or\.|and\.|but\.|as\.|if\.|the\.|its\.\
@@ -582,36 +1128,69 @@ for pn, ap in enumerate(paras.parg):
     |let\.|till\.|very\.|an\.|among\.|those\.|into\.|whom\.|having\.|thence\.)"
 
     # periods not expected after certain words
-    m = re.finditer(NOPERIODPATTERN, s)
+    m = scan("unexpected period after word", NOPERIODPATTERN, s)
     for item in m:
-        report2(pn, item, "unexpected period after word")
+        hits.append((item.start(), "unexpected period after word"))
 
     # paragraph ends with unusal character
-    m = re.finditer(r"[^.”\?!\*:]$", s)
+    m = scan("paragraph ends with unusual character", r"[^.”\?!\*:]$", s)
     for item in m:
-        report2(pn, item, "paragraph ends with unusual character")
+        hits.append((item.start(), "paragraph ends with unusual character"))
 
     # inconsistent quotation marks
     if count_straight < count_curly:
-        m = re.finditer(r'[\'"]', s)
+        m = scan("inconsistent quote marks", r'[\'"]', s)
     else:
-        m = re.finditer(r"[‘’“”]", s)
+        m = scan("inconsistent quote marks", r"[‘’“”]", s)
     for item in m:
-        report2(pn, item, "inconsistent quote marks")
+        hits.append((item.start(), "inconsistent quote marks"))
 
     # ellipsis checks
-    m = re.finditer(r"(\.\.\.\.)[^\p{Z}]", s)
+    m = scan("suspect ellipsis check", r"(\.\.\.\.)[^\p{Z}]", s)
     for item in m:
-        report2(pn, item, "suspect ellipsis check")
-    m = re.finditer(r"\P{Z}(\.\.\.)\p{Z}", s)
+        hits.append((item.start(), "suspect ellipsis check"))
+    m = scan("suspect ellipsis check", r"\P{Z}(\.\.\.)\p{Z}", s)
     for item in m:
-        report2(pn, item, "suspect ellipsis check")
-    m = re.finditer(r"\p{Z}(\.\.\.)\P{Z}", s)
+        hits.append((item.start(), "suspect ellipsis check"))
+    m = scan("suspect ellipsis check", r"\p{Z}(\.\.\.)\P{Z}", s)
     for item in m:
-        report2(pn, item, "suspect ellipsis check")
-    m = re.finditer(r"\.\.\.\.\.", s)
+        hits.append((item.start(), "suspect ellipsis check"))
+    m = scan("suspect ellipsis check", r"\.\.\.\.\.", s)
     for item in m:
-        report2(pn, item, "suspect ellipsis check")
+        hits.append((item.start(), "suspect ellipsis check"))
+
+    return hits
+
+
+if args["threads"] > 1:
+    with concurrent.futures.ThreadPoolExecutor(args["threads"]) as ex:
+        results = list(ex.map(checkPara, paras.parg))
+else:
+    results = [checkPara(ap) for ap in paras.parg]
+for pn, hits in enumerate(results):
+    for posn, desc in hits:
+        reportAt(pn, posn, desc)
+
+# unusual characters, from the character inventory.
+# names are looked up once per distinct character.
+# allow special pattern for DP-style thought break
+thoughtbreak = set()  # lines of thought break paragraphs
+for ap in paras.parg:
+    if re.match(r"^\s+\*\s+\*\s+\*\s+\*\s+\*", ap.ptext):
+        thoughtbreak.update(range(ap.startline, ap.startline + len(ap.lines)))
+if quotetype == "straight":
+    allowed_quotes = "\"'"
+else:
+    allowed_quotes = "“”‘’"
+charnames = {}  # character -> Unicode name, "" if it has none (TAB)
+for c in charcount:
+    charnames[c] = unicodedata.name(c, "")
+for c in sorted(charlines):
+    if c in allowed_quotes:
+        continue
+    for i in charlines[c]:
+        if i not in thoughtbreak:
+            reportLine(i, f"unusual character {charnames[c] or f'U+{ord(c):04X}'}")
 
 # run quote tests, paragraph at-a-time
 # use a small FSM to deal with punctuation.
@@ -733,6 +1312,24 @@ if len(shortest) > 0:
         report3(f"  {atup[0]+1:5}: {wb[atup[0]]} ({atup[1]})")
         count -= 1
 
+# character inventory table, in code point order. the first lines
+# are shown for characters outside COMMON_CHARS, numbered as in the
+# "unusual character" reports
+if args["verbose"] and len(charcount) > 0:
+    report3("character inventory:", True, True)
+    for c in sorted(charcount):
+        shown = html.escape(c) if c.isprintable() else " "
+        name = charnames[c]
+        if name == "" and unicodedata.category(c) == "Cc":
+            name = "<control>"
+        firstlines = ""
+        if c in charlines:
+            firstlines = ", ".join(str(i) for i in charlines[c][:3])
+            if len(charlines[c]) > 3:
+                firstlines += ", ..."
+        name = html.escape(f"{name:<40}")  # pad first, "<control>" is escaped
+        report3(f"  {shown} U+{ord(c):04X} {name} {charcount[c]:7}  {firstlines}")
+
 
 # check: common he/be, hut/but and had/bad checks
 
@@ -745,47 +1342,55 @@ HEBEPATTERN = "\bto he\b|\bis be\b|\bbe is\b|\bwas be\b|\bbe would\b|\bbe could\
 for pn, ap in enumerate(paras.parg):  # paragraph at a time
     s = ap.ptext  # get a paragraph as one string
 
-    m = re.finditer(HADBADPATTERN, s)
+    m = scan("had/bad suspect", HADBADPATTERN, s)
     for item in m:
         report2(pn, item, "had/bad suspect")
-    m = re.finditer(HUTBUTPATTERN, s)
+    m = scan("hut/but suspect", HUTBUTPATTERN, s)
     for item in m:
         report2(pn, item, "hut/but suspect")
-    m = re.finditer(HEBEPATTERN, s)
+    m = scan("he/be suspect", HEBEPATTERN, s)
     for item in m:
         report2(pn, item, "he/be suspect")
 
-# save results to specified file
+# checks that ran out of time are incomplete; say so
+if len(skipped_checks) > 0:
+    report3("checks not completed:", True, True)
+    for check in sorted(skipped_checks):  # threads skip in any order
+        report3(f"  {check}: skipped (timeout)")
 
-with open(args["outfile"], "w") as f:
-    f.write("<pre>")
-    f.write("pgtext run report\n")
-    f.write(f"run started: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-    f.write("source file: {}\n".format(os.path.basename(args["infile"])))
-    f.write(
-        f"<span style='color:silver'>close this window to return to the UWB.</span>\n"
-    )
-    f.write("\n")
+# save results to specified file
 
-    for line in reports3:
-        f.write(f"{line}\n")
+rbody = []
+for line in reports3:
+    rbody.append(f"{line}\n")
 
-    # these are the ones recorded with report2
-    # reports is a map. convert to list and sort
-    rlist = sorted(list(reports))
-    for k in rlist:
-        f.write(
-            f"<div style='padding-left:0.6em; margin-top:1em; background-color:papayawhip;'>{k}</div>"
-        )
-        count = 0
-        limit = 4
-        if args["verbose"]:
-            limit = 100
-        for line in reports[k]:
-            if count < limit:
-                f.write(f"   {line}\n")
-            if count == limit:
-                remain = len(reports[k]) - limit
-                f.write(f"   ... {remain} more\n")
-            count += 1
-    f.write("</pre>")
+# these are the ones recorded with report2
+# reports is a map. convert to list and sort
+rlist = sorted(list(reports))
+for k in rlist:
+    rbody.append(
+        f"<div style='padding-left:0.6em; margin-top:1em; background-color:papayawhip;'>{k}</div>"
+    )
+    count = 0
+    limit = 4
+    if args["verbose"]:
+        limit = 100
+    for line in reports[k]:
+        if count < limit:
+            rbody.append(f"   {line}\n")
+        if count == limit:
+            remain = len(reports[k]) - limit
+            rbody.append(f"   ... {remain} more\n")
+        count += 1
+rbody = "".join(rbody)
+
+writeReport(rbody)
+
+# a report with skipped checks depends on machine load. do not cache it
+if cachekey is not None and len(skipped_checks) == 0:
+    cachePut(args["cachedir"], cachekey, rbody)
+    cacheEvict(
+        args["cachedir"],
+        args["cache_max_mb"] * 1024 * 1024,
+        args["cache_max_days"] * 86400,
+    )
@@ -0,0 +1,30 @@
+"""
+shared fixtures. pgtext is a script, so the tests run it the way the
+UWB does, in a subprocess, with files in a temporary directory.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PGTEXT = os.path.join(os.path.dirname(HERE), "pgtext.py")
+
+
+@pytest.fixture
+def pgtext(tmp_path):
+    """run pgtext.py with the given arguments in tmp_path"""
+
+    def run(*args):
+        return subprocess.run(
+            [sys.executable, PGTEXT] + [str(a) for a in args],
+            capture_output=True,
+            text=True,
+            cwd=tmp_path,
+            timeout=150,
+        )
+
+    return run
+
@@ -0,0 +1,133 @@
+"""whole-file report cache (-c)"""
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PGTEXT = os.path.join(os.path.dirname(HERE), "pgtext.py")
+
+TEXT = "He saw MacPherson. then x2y went to the farm, Then left.\n"
+
+
+def entries(cachedir):
+    """names of the cached reports, without temporary files"""
+    return sorted(n for n in os.listdir(cachedir) if not n.startswith(".tmp-"))
+
+
+def report(tmp_path, name="report.htm"):
+    return (tmp_path / name).read_text(encoding="UTF-8")
+
+
+def test_hit_returns_cached_body(tmp_path, pgtext):
+    (tmp_path / "in.txt").write_text(TEXT, encoding="UTF-8")
+    assert pgtext("-i", "in.txt", "-o", "r1.htm", "-c", "cache").returncode == 0
+    (name,) = entries(tmp_path / "cache")
+    cached = tmp_path / "cache" / name
+    # mark the stored body, so a hit can be told from a rerun
+    cached.write_text(cached.read_text(encoding="UTF-8") + "MARK\n", encoding="UTF-8")
+    assert pgtext("-i", "in.txt", "-o", "r2.htm", "-c", "cache").returncode == 0
+    assert "MARK" in report(tmp_path, "r2.htm")
+    first = report(tmp_path, "r1.htm").split("\n")[2:]
+    second = report(tmp_path, "r2.htm").replace("MARK\n", "").split("\n")[2:]
+    assert first == second
+
+
+def test_key_depends_on_options_and_lists(tmp_path, pgtext):
+    (tmp_path / "in.txt").write_text(TEXT, encoding="UTF-8")
+    good = tmp_path / "good.txt"
+    good.write_text("MacPherson\n", encoding="UTF-8")
+    base = ["-i", "in.txt", "-o", "r.htm", "-c", "cache"]
+    pgtext(*base)
+    pgtext(*base)
+    assert len(entries(tmp_path / "cache")) == 1
+    pgtext(*base, "-v")
+    assert len(entries(tmp_path / "cache")) == 2
+    pgtext(*base, "-g", "good.txt")
+    assert len(entries(tmp_path / "cache")) == 3
+    good.write_text("x2y\n", encoding="UTF-8")  # same file, new contents
+    pgtext(*base, "-g", "good.txt")
+    assert len(entries(tmp_path / "cache")) == 4
+
+
+def test_key_depends_on_rules_version(tmp_path, pgtext):
+    (tmp_path / "in.txt").write_text(TEXT, encoding="UTF-8")
+    pgtext("-i", "in.txt", "-o", "r.htm", "-c", "cache")
+    # a copy of pgtext with the next rules version
+    other = tmp_path / "other"
+    other.mkdir()
+    src = open(PGTEXT, encoding="UTF-8").read()
+    assert 'RULES_VERSION = "' in src
+    src = src.replace('RULES_VERSION = "', 'RULES_VERSION = "next-', 1)
+    (other / "pgtext.py").write_text(src, encoding="UTF-8")
+    shutil.copy(os.path.join(os.path.dirname(PGTEXT), "wordlist.txt"), other)
+    rc = subprocess.run(
+        [sys.executable, str(other / "pgtext.py")]
+        + ["-i", "in.txt", "-o", "r.htm", "-c", "cache"],
+        cwd=tmp_path,
+        capture_output=True,
+    ).returncode
+    assert rc == 0
+    assert len(entries(tmp_path / "cache")) == 2
+
+
+def test_skipped_checks_not_cached(tmp_path, pgtext):
+    (tmp_path / "in.txt").write_text(TEXT, encoding="UTF-8")
+    rc = pgtext(
+        "-i", "in.txt", "-o", "r.htm", "-c", "cache", "--check-timeout", "0.000001"
+    ).returncode
+    assert rc == 0
+    assert "skipped (timeout)" in report(tmp_path, "r.htm")
+    assert not os.path.isdir(tmp_path / "cache") or entries(tmp_path / "cache") == []
+
+
+def test_age_eviction(tmp_path, pgtext):
+    cachedir = tmp_path / "cache"
+    cachedir.mkdir()
+    old = cachedir / ("0" * 64 + ".htm")
+    recent = cachedir / ("1" * 64 + ".htm")
+    old.write_text("old", encoding="UTF-8")
+    recent.write_text("recent", encoding="UTF-8")
+    now = time.time()
+    os.utime(old, (now - 3 * 86400, now - 3 * 86400))
+    os.utime(recent, (now - 12 * 3600, now - 12 * 3600))
+    (tmp_path / "in.txt").write_text(TEXT, encoding="UTF-8")
+    pgtext("-i", "in.txt", "-o", "r.htm", "-c", "cache", "--cache-max-days", "1")
+    names = entries(cachedir)
+    assert old.name not in names
+    assert recent.name in names
+    assert len(names) == 2  # recent and the new report
+
+
+def test_size_eviction_least_recently_used(tmp_path, pgtext):
+    cachedir = tmp_path / "cache"
+    cachedir.mkdir()
+    now = time.time()
+    older = cachedir / ("0" * 64 + ".htm")
+    newer = cachedir / ("1" * 64 + ".htm")
+    for fn, age in ((older, 7200), (newer, 3600)):
+        fn.write_text("x" * 600 * 1024, encoding="UTF-8")
+        os.utime(fn, (now - age, now - age))
+    (tmp_path / "in.txt").write_text(TEXT, encoding="UTF-8")
+    pgtext("-i", "in.txt", "-o", "r.htm", "-c", "cache", "--cache-max-mb", "1")
+    names = entries(cachedir)
+    assert older.name not in names
+    assert newer.name in names
+    assert len(names) == 2  # newer and the new report
+
+
+def test_stale_temporary_files_removed(tmp_path, pgtext):
+    cachedir = tmp_path / "cache"
+    cachedir.mkdir()
+    stale = cachedir / ".tmp-stale.htm"
+    fresh = cachedir / ".tmp-fresh.htm"
+    stale.write_text("partial", encoding="UTF-8")
+    fresh.write_text("partial", encoding="UTF-8")
+    now = time.time()
+    os.utime(stale, (now - 7200, now - 7200))
+    (tmp_path / "in.txt").write_text(TEXT, encoding="UTF-8")
+    pgtext("-i", "in.txt", "-o", "r.htm", "-c", "cache")
+    assert not stale.exists()
+    assert fresh.exists()  # may belong to a worker still writing it
@@ -0,0 +1,75 @@
+"""word index (-x) and keyword-in-context lookups (-q)"""
+
+import os
+
+TEXT = (
+    "I don’t know. ’Tis five o’clock, it’s late.\n"
+    "Its to-day; Today and today.\n"
+    "\n"
+    "MacPherson met MacPherson.\n"
+)
+
+
+def index(tmp_path, pgtext, text=TEXT):
+    (tmp_path / "in.txt").write_text(text, encoding="UTF-8")
+    rc = pgtext("-i", "in.txt", "-o", "report.htm", "-x", "words.idx").returncode
+    assert rc == 0
+
+
+def query(pgtext, word):
+    out = pgtext("-x", "words.idx", "-q", word)
+    assert out.returncode == 0
+    return out.stdout
+
+
+def test_case_and_hyphen_folded(tmp_path, pgtext):
+    index(tmp_path, pgtext)
+    for word in ("today", "TO-DAY", "To-day"):
+        first = query(pgtext, word).split("\n")[0]
+        assert first == '"Today" (1), "to-day" (1), "today" (1) in in.txt'
+
+
+def test_contractions_whole(tmp_path, pgtext):
+    index(tmp_path, pgtext)
+    assert '"don’t" (1)' in query(pgtext, "don’t")
+    # typed with a straight apostrophe
+    assert '"don’t" (1)' in query(pgtext, "don't")
+    assert '"o’clock" (1)' in query(pgtext, "o'clock")
+    assert '"’Tis" (1)' in query(pgtext, "’tis")
+    assert "not found" in query(pgtext, "don")
+
+
+def test_apostrophe_kept(tmp_path, pgtext):
+    index(tmp_path, pgtext)
+    assert query(pgtext, "its").split("\n")[0] == '"Its" (1) in in.txt'
+    assert query(pgtext, "it's").split("\n")[0] == '"it’s" (1) in in.txt'
+
+
+def test_context_from_source(tmp_path, pgtext):
+    index(tmp_path, pgtext)
+    out = query(pgtext, "macpherson")
+    assert "4:                               [MacPherson] met MacPherson." in out
+    assert "4:                MacPherson met [MacPherson]." in out
+
+
+def test_crlf_and_bom(tmp_path, pgtext):
+    text = "﻿" + TEXT.replace("\n", "\r\n")
+    index(tmp_path, pgtext, text)
+    out = query(pgtext, "know")
+    assert "1:                       I don’t [know]. ’Tis five o’clock, it’s" in out
+    assert "[today]." in query(pgtext, "today")
+
+
+def test_index_has_no_text(tmp_path, pgtext):
+    text = "A line of text repeated over and over again, Then more.\n\n" * 5000
+    index(tmp_path, pgtext, text)
+    # a copy of the lines alone would be as big as the text
+    assert os.path.getsize(tmp_path / "words.idx") < len(text)
+
+
+def test_changed_source(tmp_path, pgtext):
+    index(tmp_path, pgtext)
+    (tmp_path / "in.txt").write_text(TEXT + "more\n", encoding="UTF-8")
+    out = pgtext("-x", "words.idx", "-q", "today")
+    assert out.returncode == 1
+    assert "has changed since the index was saved" in out.stdout
@@ -0,0 +1,14 @@
+"""character inventory table and unusual-character findings"""
+
+
+def test_control_character_in_table(tmp_path, pgtext):
+    (tmp_path / "in.txt").write_text("a\tb\n", encoding="UTF-8")
+    rc = pgtext("-i", "in.txt", "-o", "report.htm", "-v").returncode
+    assert rc == 0
+    report = (tmp_path / "report.htm").read_text(encoding="UTF-8")
+    entry = [line for line in report.split("\n") if "U+0009 " in line]
+    assert len(entry) == 1
+    # escaped, or a browser drops it as an unknown tag
+    assert "&lt;control&gt;" in entry[0]
+    assert "<control>" not in report
+    assert "unusual character U+0009" in report
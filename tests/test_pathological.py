@@ -0,0 +1,81 @@
+"""
+pathological-input regression tests. pgtext is run as the UWB runs it,
+as a script, on input that made some checks backtrack for minutes.
+"""
+
+import base64
+import os
+import random
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PGTEXT = os.path.join(os.path.dirname(HERE), "pgtext.py")
+
+TIME_LIMIT = 15  # seconds; the old patterns took minutes on these inputs
+
+
+def run(tmp_path, text, *extra):
+    """run pgtext on text, return (exit code, report, seconds taken)"""
+    infile = tmp_path / "in.txt"
+    outfile = tmp_path / "report.htm"
+    infile.write_text(text, encoding="UTF-8")
+    started = time.monotonic()
+    rc = subprocess.run(
+        [sys.executable, PGTEXT, "-i", str(infile), "-o", str(outfile), "-v"]
+        + list(extra),
+        capture_output=True,
+        timeout=10 * TIME_LIMIT,
+    ).returncode
+    taken = time.monotonic() - started
+    return rc, outfile.read_text(encoding="UTF-8"), taken
+
+
+def test_base64_blob(tmp_path):
+    rnd = random.Random(1)
+    blob = base64.b64encode(bytes(rnd.getrandbits(8) for _ in range(150000)))
+    text = "A normal paragraph.\n\n" + blob.decode("ascii") + "\n"
+    rc, report, taken = run(tmp_path, text)
+    assert rc == 0
+    assert "skipped (timeout)" not in report
+    assert taken < TIME_LIMIT
+
+
+def test_long_letter_run(tmp_path):
+    # mixed-case and quote-direction patterns were quadratic on this
+    text = "A normal paragraph.\n\n" + "Ab" * 100000 + "1\n\n" + "aB" * 100000 + "\n"
+    rc, report, taken = run(tmp_path, text)
+    assert rc == 0
+    assert "skipped (timeout)" not in report
+    assert taken < TIME_LIMIT
+
+
+def test_check_timeout_skips(tmp_path):
+    text = "A normal paragraph, Then more.\n\n" + "aB" * 100000 + "1\n"
+    rc, report, _ = run(tmp_path, text, "--check-timeout", "0.000001")
+    assert rc == 0
+    assert "skipped (timeout)" in report
+
+
+def test_threads_same_report(tmp_path):
+    # many paragraphs, each with findings, so that the order in which
+    # threads finish would show if hits were not merged in order
+    rnd = random.Random(2)
+    samples = [
+        "He said. then he went to the farm, Then he saw her.",
+        "MacPherson and McDONALD met x2y at 3rd and 0 Street.",
+        "the, café “quoted,” ‘she’ said -- a spaced - dash...",
+        "HAPpY days; tb rare to-day, ed. and <i>tag</i> here",
+    ]
+    paras = []
+    for _ in range(600):
+        lines = [rnd.choice(samples) for _ in range(rnd.randint(1, 4))]
+        paras.append("\n".join(lines))
+    text = "\n\n".join(paras) + "\n"
+    rc1, report1, _ = run(tmp_path, text, "-j", "1")
+    rc4, report4, _ = run(tmp_path, text, "-j", "4")
+    assert rc1 == 0 and rc4 == 0
+    # the second line holds the time the run started
+    assert report1.split("\n")[2:] == report4.split("\n")[2:]
+    assert "mixed case in word" in report1
@@ -0,0 +1,52 @@
+"""layered word lists: good words (-g), names and abbreviations"""
+
+TEXT = "He met MacPherson, who drank H2O. The sur. went home.\n"
+
+
+def report(tmp_path, pgtext, *extra):
+    (tmp_path / "in.txt").write_text(TEXT, encoding="UTF-8")
+    out = pgtext("-i", "in.txt", "-o", "report.htm", "-v", *extra)
+    assert out.returncode == 0
+    return (tmp_path / "report.htm").read_text(encoding="UTF-8")
+
+
+def heading(desc):
+    return f"background-color:papayawhip;'>{desc}</div>"
+
+
+def test_reported_without_lists(tmp_path, pgtext):
+    r = report(tmp_path, pgtext)
+    assert heading("mixed case in word") in r
+    assert heading("mixed numbers/letters in word H2O") in r
+    assert heading("unexpected period") in r
+
+
+def test_goodwords_suppress(tmp_path, pgtext):
+    (tmp_path / "good.txt").write_text("MacPherson\nH2O\n", encoding="UTF-8")
+    r = report(tmp_path, pgtext, "-g", "good.txt")
+    assert heading("mixed case in word") not in r
+    assert heading("mixed numbers/letters in word H2O") not in r
+
+
+def test_names_suppress_mixed_case(tmp_path, pgtext):
+    (tmp_path / "names.txt").write_text("MacPherson\n", encoding="UTF-8")
+    r = report(tmp_path, pgtext, "--names", "names.txt")
+    assert heading("mixed case in word") not in r
+
+
+def test_abbrevs_suppress_unexpected_period(tmp_path, pgtext):
+    (tmp_path / "abbrevs.txt").write_text("sur\n", encoding="UTF-8")
+    r = report(tmp_path, pgtext, "--abbrevs", "abbrevs.txt")
+    assert heading("unexpected period") not in r
+
+
+def test_missing_list_named(tmp_path, pgtext):
+    (tmp_path / "in.txt").write_text(TEXT, encoding="UTF-8")
+    for option, kind in (
+        ("-g", "good-words (-g)"),
+        ("--abbrevs", "abbreviations (--abbrevs)"),
+        ("--names", "proper names (--names)"),
+    ):
+        out = pgtext("-i", "in.txt", "-o", "r.htm", "-c", "cache", option, "nope")
+        assert out.returncode == 1
+        assert f"FATAL: {kind} file nope not found" in out.stdout